@@ -1,146 +1,344 @@
-import os
-import textwrap
+import asyncio
+import functools
+import hashlib
 import json
-from typing import Any, Dict, List
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import google.generativeai as genai
-import asyncio
+import orjson
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from local_solver import try_compute_locally
+from prompts import build_quiz_prompt
+from settings import settings
+
+log = logging.getLogger(__name__)
+
+# Plain int / float literals, e.g. "42", "-3.5", ".5", "1e-3"
+_NUM_RE = re.compile(r"[-+]?(?:\d+(?P<frac>\.\d*)?|(?P<lead>\.\d+))(?P<exp>[eE][-+]?\d+)?\Z")
+# orjson reads integers wider than 64 bits as floats; replies with a 20+
+# digit run are parsed with the stdlib instead so big values stay exact
+_LONG_DIGITS_RE = re.compile(r"\d{20}")
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL")  # e.g. 'models/gemini-2.5-flash'
+# Answers are cached per quiz content so retries / re-runs skip the LLM
+ANSWER_CACHE_TTL = 600.0  # seconds; quiz pages may be edited
+ANSWER_CACHE_MAX = 256
+_ANSWER_CACHE: Dict[str, Tuple[float, Any]] = {}
+
+# Answers are a single short value: decode deterministically, cap the
+# reply length so a rambling model cannot burn output tokens / TPM quota,
+# and use JSON mode so the reply is always one parseable JSON value.
+# On Gemini 2.5 models thinking tokens count toward the cap, so it must
+# leave room for reasoning or the reply comes back empty (MAX_TOKENS).
+_MAX_OUTPUT_TOKENS = 8192
+_GENERATION_CONFIG = {
+    "temperature": 0,
+    "max_output_tokens": _MAX_OUTPUT_TOKENS,
+    "response_mime_type": "application/json",
+}
+
+# Per-call deadline, so a hung request cannot eat the quiz's time budget
+GEMINI_CALL_TIMEOUT = 45.0
+
+# Rough token estimate: ~4 characters per token, plus room for the reply
+_CHARS_PER_TOKEN = 4
+_OUTPUT_TOKEN_RESERVE = _MAX_OUTPUT_TOKENS
+
+GEMINI_API_KEY = settings.GEMINI_API_KEY
+GEMINI_MODEL = settings.GEMINI_MODEL
+# Optional stronger model, used only when GEMINI_MODEL gives no answer
+GEMINI_FALLBACK_MODEL = settings.GEMINI_FALLBACK_MODEL
 
 if not GEMINI_API_KEY:
-    print("[WARN] GEMINI_API_KEY is not set. Gemini calls will fail.")
-    model = None
-else:
+    log.warning("GEMINI_API_KEY is not set. Gemini calls will fail.")
+elif not GEMINI_MODEL:
+    log.error("GEMINI_MODEL is not set. Set it to a valid model name from list_models().")
+
+
+class RateLimiter:
+    """
+    Proactive requests-per-minute / tokens-per-minute throttle.
+
+    Both budgets refill continuously at their per-minute rate. A call waits
+    until they cover its estimated cost, so bursts are spread out instead
+    of bouncing off the provider's 429s.
+    """
+
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float) -> None:
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.avail_req = max_requests_per_minute
+        self.avail_tok = max_tokens_per_minute
+        self.last_update_ts = time.monotonic()
+        # Created lazily: an asyncio.Lock is tied to the loop it is used on
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.last_update_ts
+        self.last_update_ts = now
+        self.avail_req = min(
+            self.max_requests_per_minute,
+            self.avail_req + elapsed * self.max_requests_per_minute / 60.0,
+        )
+        self.avail_tok = min(
+            self.max_tokens_per_minute,
+            self.avail_tok + elapsed * self.max_tokens_per_minute / 60.0,
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request and `tokens` tokens are available, then take them."""
+        # A single oversized call must still be able to run eventually
+        tokens = min(tokens, int(self.max_tokens_per_minute))
+        # The lock keeps waiters in FIFO order
+        async with self._get_lock():
+            while True:
+                self._refill()
+                if self.avail_req >= 1 and self.avail_tok >= tokens:
+                    self.avail_req -= 1
+                    self.avail_tok -= tokens
+                    return
+                # Sleep just long enough for the scarcer budget to refill
+                wait_req = (1 - self.avail_req) * 60.0 / self.max_requests_per_minute
+                wait_tok = (tokens - self.avail_tok) * 60.0 / self.max_tokens_per_minute
+                await asyncio.sleep(max(wait_req, wait_tok, 0.05))
+
+
+_RATE_LIMITER = RateLimiter(settings.GEMINI_MAX_RPM, settings.GEMINI_MAX_TPM)
+
+# Process-wide cap on in-flight Gemini calls, on top of the per-minute
+# throttle; rebuilt per event loop, as asyncio primitives are loop-bound
+_LLM_SEM: Optional[asyncio.Semaphore] = None
+_LLM_SEM_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _llm_sem() -> asyncio.Semaphore:
+    global _LLM_SEM, _LLM_SEM_LOOP
+    loop = asyncio.get_running_loop()
+    if _LLM_SEM is None or _LLM_SEM_LOOP is not loop:
+        _LLM_SEM = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        _LLM_SEM_LOOP = loop
+    return _LLM_SEM
+
+
+def _estimate_tokens(*texts: str) -> int:
+    return sum(len(t) for t in texts) // _CHARS_PER_TOKEN + _OUTPUT_TOKEN_RESERVE
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # google.api_core errors carry the HTTP status as `.code`
+    return getattr(exc, "code", None) in (429, 500, 502, 503, 504)
+
+
+# Quizzes must be answered within a few minutes, so the retry budget is
+# kept well under that
+@retry(
+    retry=retry_if_exception(_is_transient),
+    wait=wait_random_exponential(min=1, max=20),
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+async def _call_gemini(model: Any, contents: List[str], est_tokens: int) -> str:
+    sem = _llm_sem()
+    if sem.locked():
+        log.info(
+            "All %d Gemini slots busy; waiting for one to free up",
+            settings.GEMINI_MAX_CONCURRENCY,
+        )
+    async with sem:
+        # Every attempt, retries included, goes through the throttle
+        await _RATE_LIMITER.acquire(est_tokens)
+        # Use the SDK's native async call so no thread-pool slot is held
+        response = await model.generate_content_async(
+            contents,
+            generation_config=_GENERATION_CONFIG,
+            request_options={"timeout": GEMINI_CALL_TIMEOUT},
+        )
+    try:
+        return response.text
+    except ValueError:
+        # No text parts in the reply (e.g. blocked by safety filters)
+        return ""
+
+
+def _validate_key(name: str, value: Optional[str], *, min_len: int = 20) -> None:
+    """
+    Cheap local sanity check for an API key.
+
+    Catches empty, placeholder or whitespace-padded keys before they cost a
+    full round-trip to the provider only to come back as 401.
+    """
+    if not value or value.strip() != value or len(value) < min_len:
+        raise RuntimeError(f"{name} is missing or malformed")
+
+
+@functools.lru_cache(maxsize=2)
+def _get_model(model_name: Optional[str]):
+    """
+    Import the Gemini SDK and build the named model on first use.
+
+    Keeps the heavy SDK import and client setup out of app startup; each
+    model is cached so later calls reuse it.
+    """
+    _validate_key("GEMINI_API_KEY", GEMINI_API_KEY)
+    if not model_name:
+        raise RuntimeError("GEMINI_MODEL is not configured")
+
+    import google.generativeai as genai
+
     genai.configure(api_key=GEMINI_API_KEY)
-    if not GEMINI_MODEL:
-        print("[ERROR] GEMINI_MODEL is not set. Set it to a valid model name from list_models().")
-        model = None
-    else:
-        try:
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            print(f"[INFO] Using Gemini model: {GEMINI_MODEL}")
-        except Exception as e:
-            print(f"[ERROR] Could not initialize Gemini model '{GEMINI_MODEL}': {e}")
-            model = None
+    model = genai.GenerativeModel(model_name)
+    log.info("Using Gemini model: %s", model_name)
+    return model
 
 
+def _cache_key(
+    quiz_url: str,
+    page_text: str,
+    quiz_instructions: str,
+    data_files: List[Dict[str, Any]],
+) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in (quiz_url, page_text, quiz_instructions, repr(data_files)):
+        h.update(part.encode("utf-8", errors="replace"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cache_put(key: str, answer: Any) -> None:
+    _ANSWER_CACHE.pop(key, None)
+    if len(_ANSWER_CACHE) >= ANSWER_CACHE_MAX:
+        # Dicts keep insertion order, so the first key is the oldest entry
+        _ANSWER_CACHE.pop(next(iter(_ANSWER_CACHE)))
+    _ANSWER_CACHE[key] = (time.monotonic(), answer)
+
+
+def forget_answer(
+    quiz_url: str,
+    page_text: str,
+    quiz_instructions: str,
+    data_files: List[Dict[str, Any]],
+) -> None:
+    """Drop a cached answer, e.g. after the quiz server marked it wrong."""
+    _ANSWER_CACHE.pop(_cache_key(quiz_url, page_text, quiz_instructions, data_files), None)
+
 
 async def ask_llm_for_answer(
     quiz_url: str,
     page_text: str,
     quiz_instructions: str,
     data_files: List[Dict[str, Any]],
+    force: bool = False,
 ) -> Any:
     """
     Ask Gemini to compute the 'answer' value for this quiz.
 
     Returns a Python object that can be JSON-serialized:
-        - int / float / bool / str / dict / list
+        - int / float / bool / str / dict / list / None
+
+    Answers are cached for ANSWER_CACHE_TTL seconds, keyed by the quiz URL
+    and a hash of the page text, instructions and data files; pass
+    force=True to skip the cache lookup and ask the model again.
     """
 
-    if model is None:
-        raise RuntimeError("GEMINI_API_KEY or model is not configured correctly")
-
-    # Prepare compact description of data files
-    files_summary_parts = []
-    for idx, f in enumerate(data_files, start=1):
-        snippet = f.get("text_snippet", "")
-        if len(snippet) > 4000:
-            snippet = snippet[:4000] + "\n...[truncated]..."
-        files_summary_parts.append(
-            f"File {idx} ({f.get('url')}):\n"
-            f"Content type: {f.get('content_type')}\n"
-            f"Preview:\n{snippet}\n"
-        )
+    # Plain arithmetic questions are answered locally, no LLM round-trip
+    local_answer = try_compute_locally(quiz_instructions)
+    if local_answer is not None:
+        return local_answer
 
-    files_summary = "\n\n".join(files_summary_parts) if files_summary_parts else "No extra files."
-
-    # Truncate page text to keep tokens reasonable
-    if len(page_text) > 8000:
-        page_text_short = page_text[:8000] + "\n...[truncated]..."
-    else:
-        page_text_short = page_text
-
-    sys_prompt = textwrap.dedent(
-        """
-        You are an expert data-science quiz solver.
-        You are given:
-        - A QUIZ PAGE TEXT with instructions and examples.
-        - Zero or more DATA FILES (CSV/JSON/TXT/PDF extracted as text).
-
-        Your task: compute the exact value for the field named "answer" in a JSON payload
-        we will send back to the quiz server.
-
-        IMPORTANT RULES:
-        - READ the instructions carefully.
-        - Use only the information provided in the quiz text and data files.
-        - If the answer is numeric, return just the number (no quotes).
-        - If the answer is a boolean, return true or false (lowercase).
-        - If the answer is a string, return the string without any extra commentary.
-        - If the answer must be a JSON object or array, return valid JSON.
-        - DO NOT include any explanation or extra text, only the final answer.
-        """
-    ).strip()
-
-    user_prompt = textwrap.dedent(
-        f"""
-        QUIZ URL:
-        {quiz_url}
-
-        QUIZ PAGE TEXT:
-        {page_text_short}
-
-        QUIZ INSTRUCTIONS / QUESTION:
-        {quiz_instructions}
-
-        DATA FILES (if any, extracted as text):
-        {files_summary}
-
-        Now compute the required "answer" value.
-        Output ONLY the final answer, nothing else.
-        """
-    ).strip()
-
-    # Gemini client is synchronous; wrap in a thread so we can await it
-    def _call_gemini():
-        response = model.generate_content(
-            [
-                sys_prompt,
-                "\n\n----\n\n",
-                user_prompt,
-            ]
-        )
-        return response.text.strip()
+    key = _cache_key(quiz_url, page_text, quiz_instructions, data_files)
+    cached = None if force else _ANSWER_CACHE.get(key)
+    if cached and time.monotonic() - cached[0] < ANSWER_CACHE_TTL:
+        return cached[1]
 
-    raw_content = await asyncio.to_thread(_call_gemini)
-    raw_content = raw_content.strip()
+    model = _get_model(GEMINI_MODEL)
 
-    # Try to interpret as JSON, number, boolean, or string
+    sys_prompt, user_prompt = build_quiz_prompt(
+        quiz_url=quiz_url,
+        page_text=page_text,
+        quiz_instructions=quiz_instructions,
+        data_files=data_files,
+    )
 
-    # 1. Try JSON
-    try:
-        return json.loads(raw_content)
-    except Exception:
-        pass
+    contents = [
+        sys_prompt,
+        "\n\n----\n\n",
+        user_prompt,
+    ]
+    est_tokens = _estimate_tokens(sys_prompt, user_prompt)
+    raw_content = (await _call_gemini(model, contents, est_tokens)).strip()
+
+    # Cascade: escalate to the stronger model only if the first pass failed
+    if not raw_content and GEMINI_FALLBACK_MODEL:
+        log.info("Empty answer from %s; retrying with %s", GEMINI_MODEL, GEMINI_FALLBACK_MODEL)
+        fallback = _get_model(GEMINI_FALLBACK_MODEL)
+        raw_content = (await _call_gemini(fallback, contents, est_tokens)).strip()
+    if not raw_content:
+        raise RuntimeError("Gemini returned an empty answer")
+
+    answer = _parse_answer(raw_content)
+    _cache_put(key, answer)
+    return answer
 
-    # 2. Boolean
-    lowered = raw_content.lower()
-    if lowered == "true":
+
+def _parse_answer(raw: str) -> Any:
+    """
+    Interpret the model output as JSON, boolean, null, number, or plain string.
+
+    Dispatches on the first character so only output that looks like JSON
+    is handed to the JSON parser; everything else is classified without
+    raising.
+    """
+    if not raw:
+        return raw
+    c = raw[0]
+
+    # 1. JSON object / array / quoted string
+    if c in '{["':
+        try:
+            if _LONG_DIGITS_RE.search(raw):
+                return json.loads(raw)
+            return orjson.loads(raw)
+        except ValueError:
+            # json and orjson decode errors are both ValueErrors
+            return raw
+
+    # 2. Boolean / null (only lowercase a copy when the length can match)
+    n = len(raw)
+    if n == 4 and raw.lower() == "true":
         return True
-    if lowered == "false":
+    if n == 5 and raw.lower() == "false":
         return False
+    if n == 4 and raw == "null":
+        # JSON mode may legitimately reply with null
+        return None
 
     # 3. Number
-    try:
-        if "." in raw_content:
-            return float(raw_content)
-        else:
-            return int(raw_content)
-    except Exception:
-        pass
+    m = _NUM_RE.match(raw)
+    if m:
+        if m.group("frac") or m.group("lead") or m.group("exp"):
+            return float(raw)
+        try:
+            return int(raw)
+        except ValueError:
+            # Beyond Python's int string-conversion digit limit
+            return raw
 
     # 4. Fallback: plain string
-    return raw_content
+    return raw
 
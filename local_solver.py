@@ -0,0 +1,70 @@
+# local_solver.py
+
+import ast
+import math
+import operator
+import re
+from typing import Any, Optional, Union
+
+# Questions of the form "What is 17 * (3 + 4)?" and nothing else
+_ARITH_RE = re.compile(r"^\s*what\s+is\s+([-\d.+*/() ]+?)\s*\??\s*$", re.IGNORECASE)
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# Larger results are left to the LLM; they cannot be serialized safely
+_MAX_ABS_RESULT = 10**300
+
+
+def _eval_node(node: ast.AST) -> Union[int, float]:
+    """Evaluate a whitelisted arithmetic AST; anything else raises ValueError."""
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BIN_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"Unsupported expression node: {type(node).__name__}")
+
+
+def try_compute_locally(quiz_instructions: str) -> Optional[Any]:
+    """
+    Answer plain arithmetic questions ("What is 17*23?") without an LLM.
+
+    Returns the computed number, or None if the instructions are not a
+    simple arithmetic question (the caller should then ask the LLM).
+    """
+    m = _ARITH_RE.match(quiz_instructions)
+    if not m:
+        return None
+
+    try:
+        tree = ast.parse(m.group(1), mode="eval")
+        result = _eval_node(tree)
+    except (
+        SyntaxError,
+        ValueError,
+        ZeroDivisionError,
+        OverflowError,
+        RecursionError,
+        MemoryError,
+    ):
+        # Pathological input (huge or deeply nested expressions) falls
+        # through to the LLM instead of failing the quiz step
+        return None
+
+    if isinstance(result, float) and not math.isfinite(result):
+        return None
+    if abs(result) > _MAX_ABS_RESULT:
+        return None
+    return result
@@ -1,33 +1,70 @@
 # main.py
 
-import os
 import asyncio
-from typing import Any, Dict
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+import quiz_solver
 from quiz_solver import run_quiz_chain
+from settings import settings
 
 # ---------------------------------------------------------
 # Config
 # ---------------------------------------------------------
 
-STUDENT_EMAIL = os.getenv("STUDENT_EMAIL")
-STUDENT_SECRET = os.getenv("STUDENT_SECRET")
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(name)s %(levelname)s %(message)s",
+)
+log = logging.getLogger(__name__)
+
+STUDENT_EMAIL = settings.STUDENT_EMAIL
+STUDENT_SECRET = settings.STUDENT_SECRET
 
 if not STUDENT_SECRET:
-    print("[WARN] STUDENT_SECRET is not set. Secret verification will always fail.")
+    log.warning("STUDENT_SECRET is not set. Secret verification will always fail.")
 if not STUDENT_EMAIL:
-    print("[WARN] STUDENT_EMAIL is not set. Email will not be checked strictly.")
+    log.warning("STUDENT_EMAIL is not set. Email will not be checked strictly.")
+
+# Cap how many quiz chains run at once so a burst of requests cannot
+# exhaust sockets / memory; extra requests wait their turn. Built per
+# event loop, like the shared HTTP client in quiz_solver.
+_QUIZ_SEM: Optional[asyncio.Semaphore] = None
+_QUIZ_SEM_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _quiz_sem() -> asyncio.Semaphore:
+    global _QUIZ_SEM, _QUIZ_SEM_LOOP
+    loop = asyncio.get_running_loop()
+    if _QUIZ_SEM is None or _QUIZ_SEM_LOOP is not loop:
+        _QUIZ_SEM = asyncio.Semaphore(settings.MAX_CONCURRENT_QUIZZES)
+        _QUIZ_SEM_LOOP = loop
+    return _QUIZ_SEM
 
 
 # ---------------------------------------------------------
 # FastAPI app
 # ---------------------------------------------------------
 
-app = FastAPI(title="LLM Analysis Quiz Solver")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Close the pooled HTTP connections shared by all quiz requests
+    await quiz_solver.aclose()
+
+
+app = FastAPI(
+    title="LLM Analysis Quiz Solver",
+    lifespan=lifespan,
+)
 
 # Allow CORS just in case (not strictly needed for TDS evaluation)
 app.add_middleware(
@@ -39,10 +76,26 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(
+    request: Request, exc: RequestValidationError
+) -> JSONResponse:
+    # Project spec wants 400 (not FastAPI's default 422) for invalid JSON
+    return JSONResponse(
+        status_code=400,
+        content={
+            "status": "error",
+            "error": "Invalid JSON payload",
+            "detail": jsonable_encoder(exc.errors()),
+        },
+    )
+
+
 class QuizRequest(BaseModel):
     email: str
     secret: str
     url: str
+    force: bool = False  # skip cached LLM answers and re-ask the model
 
 
 class QuizResponse(BaseModel):
@@ -67,7 +120,8 @@ async def run_quiz(payload: QuizRequest) -> Dict[str, Any]:
       {
         "email": "...",
         "secret": "...",
-        "url": "https://tds-llm-analysis.s-anand.net/quiz-xxx"
+        "url": "https://tds-llm-analysis.s-anand.net/quiz-xxx",
+        "force": false            # optional: bypass the answer cache
       }
 
     Returns:
@@ -96,19 +150,22 @@ async def run_quiz(payload: QuizRequest) -> Dict[str, Any]:
     # 3. (Optional) Check email matches
     if STUDENT_EMAIL and payload.email != STUDENT_EMAIL:
         # Not strictly required to reject, but we log it
-        print(
-            f"[WARN] Request email {payload.email} != STUDENT_EMAIL {STUDENT_EMAIL}. "
-            "Continuing anyway."
+        log.warning(
+            "Request email %s != STUDENT_EMAIL %s. Continuing anyway.",
+            payload.email,
+            STUDENT_EMAIL,
         )
 
     # 4. Run quiz chain
     try:
-        result = await run_quiz_chain(
-            quiz_url=payload.url,
-            email=payload.email,
-            secret=payload.secret,
-            max_steps=5,
-        )
+        async with _quiz_sem():
+            result = await run_quiz_chain(
+                quiz_url=payload.url,
+                email=payload.email,
+                secret=payload.secret,
+                max_steps=5,
+                force=payload.force,
+            )
         return {
             "status": "ok",
             "email": payload.email,
@@ -120,8 +177,7 @@ async def run_quiz(payload: QuizRequest) -> Dict[str, Any]:
     except Exception as e:
         # Catch all internal errors and wrap them
         err_str = f"{type(e).__name__}: {e}"
-        print("=== INTERNAL ERROR ===")
-        print(err_str)
+        log.error("Internal error: %s", err_str)
         return {
             "status": "error",
             "error": err_str,
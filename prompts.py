@@ -0,0 +1,91 @@
+# prompts.py
+
+import textwrap
+from typing import Any, Dict, List, Tuple
+
+# Character limits applied before text is placed in the prompt
+PAGE_MAX = 8000
+SNIP_MAX = 4000
+
+
+# Prompts are static, so dedent them once at import rather than per call.
+SYS_PROMPT = textwrap.dedent(
+    """
+    You are an expert data-science quiz solver.
+    You are given:
+    - A QUIZ PAGE TEXT with instructions and examples.
+    - Zero or more DATA FILES (CSV/JSON/TXT/PDF extracted as text).
+
+    Your task: compute the exact value for the field named "answer" in a JSON payload
+    we will send back to the quiz server.
+
+    IMPORTANT RULES:
+    - READ the instructions carefully.
+    - Use only the information provided in the quiz text and data files.
+    - If the answer is numeric, return just the number (no quotes).
+    - If the answer is a boolean, return true or false (lowercase).
+    - If the answer is a string, return it as a JSON string in double quotes.
+    - If the answer must be a JSON object or array, return valid JSON.
+    - Return exactly one JSON value; do not wrap it in {"answer": ...}.
+    - DO NOT include any explanation or extra text, only the final answer.
+    """
+).strip()
+
+_USER_TMPL = textwrap.dedent(
+    """
+    QUIZ URL:
+    {quiz_url}
+    {page_section}
+    QUIZ INSTRUCTIONS / QUESTION:
+    {quiz_instructions}
+
+    DATA FILES (if any, extracted as text):
+    {files_summary}
+
+    Now compute the required "answer" value.
+    Output ONLY the final answer, nothing else.
+    """
+).strip()
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cut text to `limit` characters, marking it if anything was dropped."""
+    head = text[: limit + 1]
+    if len(head) > limit:
+        return head[:limit] + "\n...[truncated]..."
+    return head
+
+
+def build_quiz_prompt(
+    quiz_url: str,
+    page_text: str,
+    quiz_instructions: str,
+    data_files: List[Dict[str, Any]],
+) -> Tuple[str, str]:
+    """
+    Build the (system prompt, user prompt) pair for an LLM quiz call.
+
+    Shared by every LLM client so prompt wording and truncation stay in
+    one place. The page text is only included when it adds something
+    beyond the instructions (today the instructions *are* the page text).
+    """
+    # Prepare compact description of data files
+    files_summary = "\n\n".join(
+        f"File {idx} ({f.get('url')}):\n"
+        f"Content type: {f.get('content_type')}\n"
+        f"Preview:\n{_truncate(f.get('text_snippet', ''), SNIP_MAX)}\n"
+        for idx, f in enumerate(data_files, start=1)
+    ) or "No extra files."
+
+    page_section = ""
+    if page_text.strip() != quiz_instructions.strip():
+        # Truncate page text to keep tokens reasonable
+        page_section = f"\nQUIZ PAGE TEXT:\n{_truncate(page_text, PAGE_MAX)}\n"
+
+    user_prompt = _USER_TMPL.format(
+        quiz_url=quiz_url,
+        page_section=page_section,
+        quiz_instructions=quiz_instructions,
+        files_summary=files_summary,
+    )
+    return SYS_PROMPT, user_prompt
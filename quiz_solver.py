@@ -1,76 +1,232 @@
 # quiz_solver.py
 
 import asyncio
+import base64
+import html as _html
 import json
 import re
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
 import httpx
-
-from gemini_client import ask_llm_for_answer
+import orjson
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+try:
+    from lxml import html as lxml_html  # type: ignore
+except ImportError:  # fall back to the regex helpers below
+    lxml_html = None
+
+from gemini_client import ask_llm_for_answer, forget_answer
+from settings import settings
 
 # Global HTTP client timeout (in seconds)
 HTTP_TIMEOUT = 60.0
 
+# Shared client: repeated requests to the quiz host / data-file hosts reuse
+# keep-alive connections instead of paying a TCP + TLS handshake each time.
+# The client, like the semaphores below, is tied to the event loop it was
+# first used on, so it is rebuilt when a new loop comes along.
+_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, (re)creating it if missing, closed or from an old loop."""
+    global _CLIENT, _CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _CLIENT is None or _CLIENT.is_closed or _CLIENT_LOOP is not loop:
+        _CLIENT = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _CLIENT_LOOP = loop
+    return _CLIENT
+
+
+# Per-host cap on concurrent data-file downloads, kept well within the
+# pool's keep-alive limit so one busy host cannot monopolise it
+MAX_CONCURRENT_PER_HOST = 8
+_HOST_SEM: Dict[str, asyncio.Semaphore] = {}
+_HOST_SEM_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _host_sem(host: str) -> asyncio.Semaphore:
+    """Per-host download semaphore for the running event loop."""
+    global _HOST_SEM_LOOP
+    loop = asyncio.get_running_loop()
+    if _HOST_SEM_LOOP is not loop:
+        _HOST_SEM.clear()
+        _HOST_SEM_LOOP = loop
+    sem = _HOST_SEM.get(host)
+    if sem is None:
+        sem = _HOST_SEM[host] = asyncio.Semaphore(MAX_CONCURRENT_PER_HOST)
+    return sem
+
+
+async def aclose() -> None:
+    """Close the shared HTTP client (call once on app shutdown)."""
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+
+
+# Download caps: the LLM only ever sees the first few KB of a data file,
+# so there is no point pulling (or holding) a huge body in memory.
+MAX_TEXT_BYTES = 4 * 1024 * 1024
+MAX_PDF_BYTES = 16 * 1024 * 1024
+# Characters of extracted text kept per file
+MAX_FILE_TEXT = 8000
+# Link suffixes treated as downloadable data files
+_DATA_FILE_EXTS = (".csv", ".json", ".txt", ".tsv", ".pdf")
+
+
+# Regexes are compiled once at import and reused on every page
+_RE_SCRIPT = re.compile(r"<script.*?</script>", re.DOTALL | re.IGNORECASE)
+_RE_STYLE = re.compile(r"<style.*?</style>", re.DOTALL | re.IGNORECASE)
+_RE_BR = re.compile(r"<\s*br\s*/?>", re.IGNORECASE)
+_RE_P_CLOSE = re.compile(r"</p\s*>", re.IGNORECASE)
+_RE_TAG = re.compile(r"<[^>]+>")
+_RE_HREF = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
+_RE_HTTP_URL = re.compile(r"https?://[^\s\"'<>]+")
+_RE_ATOB = re.compile(r"atob\(\s*([`\"])([^`\"]+)\1\s*\)")
+_RE_TEMPLATE_BLOCK = re.compile(
+    r"\{[^{}]*\"email\"[^{}]*\"secret\"[^{}]*\}",
+    re.DOTALL | re.IGNORECASE,
+)
+_RE_TRAIL_COMMA = re.compile(r",(\s*[}\]])")
+# orjson reads integers wider than 64 bits as floats; JSON containing a
+# 20+ digit run is parsed with the stdlib instead so big values stay exact
+_RE_LONG_DIGITS = re.compile(r"\d{20}")
+_RE_LONG_DIGITS_B = re.compile(rb"\d{20}")
+# Page-text compaction: inline base64 payloads and runs of blank lines
+_RE_DATA_URI = re.compile(r"data:[^,\s]{0,80},[A-Za-z0-9+/=]{200,}")
+_RE_TRAILING_WS = re.compile(r"[^\S\n]+\n")
+_RE_BLANK_LINES = re.compile(r"\n{3,}")
+# Submit-URL forms. The phrase gets its own search: in a combined
+# alternation a URL glued to the phrase ("…/submitPost your answer to …")
+# would consume it. Absolute and relative URLs share one pass.
+_RE_SUBMIT_PHRASE = re.compile(
+    r"Post your answer to\s+(https?://[^\s\"'<>]+)", re.IGNORECASE
+)
+_RE_SUBMIT_ABS = re.compile(r"https?://[^\s\"'<>]*submit[^\s\"'<>]*", re.IGNORECASE)
+_RE_SUBMIT_URL = re.compile(
+    r"(?P<absolute>https?://[^\s\"'<>]*submit[^\s\"'<>]*)"
+    r"|(?P<relative>/submit[^\s\"'<>]*)",
+    re.IGNORECASE,
+)
+_RE_HTTP_SCHEME = re.compile(r"https?://", re.IGNORECASE)
+
 
 # ---------------------------------------------------------
 # 1. Fetch and parse quiz page
 # ---------------------------------------------------------
 
-async def fetch_quiz_page(url: str) -> Tuple[str, str, List[str]]:
+async def fetch_quiz_page(
+    url: str,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Tuple[str, str, List[str]]:
     """
     Fetch the quiz page HTML and extract:
       - raw HTML
       - text content (including decoded atob(`...`) blocks)
       - list of links (href URLs)
     """
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as http_client:
-        resp = await http_client.get(url)
-        resp.raise_for_status()
-        html = resp.text
+    client = client or get_client()
+    resp = await client.get(url)
+    resp.raise_for_status()
+    html = resp.text
 
-    # Basic text extraction: strip tags roughly
-    page_text = strip_html_tags(html)
+    # Parse once for text extraction; links come from the raw HTML below
+    doc = parse_html(html)
 
-    # Handle atob(`...`) JavaScript blocks that contain base64 text of the question
-    decoded_texts = extract_atob_blocks(html)
-    if decoded_texts:
-        page_text += "\n\n" + "\n\n".join(decoded_texts)
+    # Basic text extraction: strip tags, then append any atob(`...`)
+    # JavaScript blocks that contain base64 text of the question
+    parts = [strip_html_tags(html, doc)]
+    parts.extend(extract_atob_blocks(html))
+    page_text = compact_text("\n\n".join(parts))
 
     # Extract all links
     links = extract_links(html)
-    # Also try to capture http/https URLs that appear as plain text
-    links.extend(extract_inline_urls(page_text))
+    # Also try to capture http/https URLs that appear as plain text; scan
+    # each part rather than the joined copy
+    for part in parts:
+        links.extend(extract_inline_urls(part))
 
-    # Deduplicate links
-    links = sorted(set(links))
+    # Deduplicate links, keeping document order
+    links = list(dict.fromkeys(links))
 
     return html, page_text, links
 
 
-def strip_html_tags(html: str) -> str:
-    """Very rough HTML → text conversion."""
+def parse_html(html: str) -> Optional[Any]:
+    """
+    Parse HTML with lxml so callers can share one tree.
+
+    Returns None when lxml is not installed or the page cannot be parsed;
+    the extract helpers then fall back to regex scanning.
+    """
+    if lxml_html is None or not html.strip():
+        return None
+    try:
+        return lxml_html.fromstring(html)
+    except Exception:
+        return None
+
+
+def strip_html_tags(html: str, doc: Optional[Any] = None) -> str:
+    """
+    HTML → text conversion.
+
+    Uses the parsed lxml tree when given (note: <script>/<style> are
+    dropped from it in place), otherwise a rough regex pass over `html`.
+    """
+    if doc is not None:
+        for el in doc.xpath("//script|//style"):
+            el.drop_tree()
+        # Keep the line breaks the regex path produces for <br> and </p>
+        for el in doc.iter("br", "p"):
+            el.tail = "\n" + (el.tail or "")
+        return doc.text_content()
+
     # Remove script and style
-    html = re.sub(r"<script.*?</script>", "", html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r"<style.*?</style>", "", html, flags=re.DOTALL | re.IGNORECASE)
+    html = _RE_SCRIPT.sub("", html)
+    html = _RE_STYLE.sub("", html)
 
     # Replace <br> and <p> with newlines
-    html = re.sub(r"<\s*br\s*/?>", "\n", html, flags=re.IGNORECASE)
-    html = re.sub(r"</p\s*>", "\n", html, flags=re.IGNORECASE)
+    html = _RE_BR.sub("\n", html)
+    html = _RE_P_CLOSE.sub("\n", html)
 
     # Remove remaining tags
-    text = re.sub(r"<[^>]+>", "", html)
-    # Unescape common entities
-    text = text.replace("&nbsp;", " ").replace("&amp;", "&")
-    text = text.replace("&lt;", "<").replace("&gt;", ">")
-    return text
+    text = _RE_TAG.sub("", html)
+    # Unescape entities (named and numeric) in one pass
+    return _html.unescape(text)
+
+
+def compact_text(text: str) -> str:
+    """
+    Drop token-wasting noise from extracted page text: inline base64 data
+    URIs, trailing whitespace and runs of blank lines.
+    """
+    text = _RE_DATA_URI.sub("<DATA_URI_OMITTED>", text)
+    text = _RE_TRAILING_WS.sub("\n", text)
+    return _RE_BLANK_LINES.sub("\n\n", text)
 
 
 def extract_links(html: str) -> List[str]:
-    """Extract href links from <a href="..."> tags."""
+    """
+    Extract href="..." targets from the raw HTML.
+
+    Scans the source rather than the lxml tree so hrefs on any tag, and
+    inside inline <script> strings (JS-rendered links), are still found.
+    """
     links: List[str] = []
-    for m in re.finditer(r'href=["\']([^"\']+)["\']', html, flags=re.IGNORECASE):
+    for m in _RE_HREF.finditer(html):
         links.append(m.group(1))
     return links
 
@@ -78,7 +234,7 @@ def extract_links(html: str) -> List[str]:
 def extract_inline_urls(text: str) -> List[str]:
     """Extract http/https URLs that appear as plain text in the page."""
     urls: List[str] = []
-    for m in re.finditer(r"https?://[^\s\"'<>]+", text):
+    for m in _RE_HTTP_URL.finditer(text):
         urls.append(m.group(0))
     return urls
 
@@ -86,21 +242,18 @@ def extract_inline_urls(text: str) -> List[str]:
 def extract_atob_blocks(html: str) -> List[str]:
     """
     Look for JS blocks like:
-      atob(`...base64...`)
+      atob(`...base64...`)  or  atob("...base64...")
     Decode them as UTF-8 and return the decoded strings.
     """
     decoded: List[str] = []
-    for m in re.finditer(r"atob\(\s*`([^`]+)`\s*\)", html):
-        b64 = m.group(1).strip()
+    for m in _RE_ATOB.finditer(html):
         try:
-            import base64
-
-            data = base64.b64decode(b64)
-            decoded_text = data.decode("utf-8", errors="replace")
-            decoded.append(decoded_text)
-        except Exception:
-            # Ignore malformed base64
+            # validate=False skips non-alphabet chars (whitespace, newlines)
+            data = base64.b64decode(m.group(2), validate=False)
+        except ValueError:
+            # Ignore malformed base64 (e.g. bad padding)
             continue
+        decoded.append(data.decode("utf-8", errors="replace"))
     return decoded
 
 
@@ -143,11 +296,12 @@ def extract_submission_template(page_text: str) -> Optional[Dict[str, Any]]:
     if not page_text:
         return None
 
-    match = re.search(
-        r"\{[^{}]*\"email\"[^{}]*\"secret\"[^{}]*\}",
-        page_text,
-        flags=re.DOTALL | re.IGNORECASE,
-    )
+    # Cheap substring checks first: most pages have no template at all, and
+    # the [^{}]* scan can backtrack heavily on brace-heavy pages
+    if '"email"' not in page_text or '"secret"' not in page_text:
+        return None
+
+    match = _RE_TEMPLATE_BLOCK.search(page_text)
     if not match:
         return None
 
@@ -162,13 +316,17 @@ def extract_submission_template(page_text: str) -> Optional[Dict[str, Any]]:
     cleaned = "\n".join(cleaned_lines)
 
     # Remove trailing commas before '}' or ']'
-    cleaned = re.sub(r",(\s*[}\]])", r"\1", cleaned)
+    cleaned = _RE_TRAIL_COMMA.sub(r"\1", cleaned)
 
     try:
-        template = json.loads(cleaned)
+        if _RE_LONG_DIGITS.search(cleaned):
+            template = json.loads(cleaned)
+        else:
+            template = orjson.loads(cleaned)
         if isinstance(template, dict):
             return template
-    except Exception:
+    except ValueError:
+        # json and orjson decode errors are both ValueErrors
         return None
 
     return None
@@ -190,31 +348,34 @@ def find_submit_url(
     blob = (page_text or "") + "\n" + (html or "")
 
     # 1. Exact phrase: 'Post your answer to <url>'
-    m = re.search(
-        r"Post your answer to\s+(https?://[^\s\"'<>]+)",
-        blob,
-        flags=re.IGNORECASE,
-    )
+    m = _RE_SUBMIT_PHRASE.search(blob)
     if m:
         return m.group(1).strip()
 
-    # 2. Any absolute URL containing 'submit'
-    m = re.search(
-        r"(https?://[^\s\"'<>]*submit[^\s\"'<>]*)",
-        blob,
-        flags=re.IGNORECASE,
-    )
-    if m:
-        return m.group(1).strip()
+    # 2. Any absolute URL containing 'submit'. One pass finds the first
+    # absolute and the first relative match; only if a relative match
+    # swallowed an http(s) URL (e.g. "/submithttps://…") can it hide an
+    # earlier absolute one, and then a dedicated search settles it.
+    relative: Optional[str] = None
+    hidden_abs = False
+    for m in _RE_SUBMIT_URL.finditer(blob):
+        if m.group("absolute"):
+            if not hidden_abs:
+                return m.group("absolute").strip()
+            break
+        if relative is None:
+            relative = m.group("relative")
+        if _RE_HTTP_SCHEME.search(m.group("relative")):
+            hidden_abs = True
+            break
+    if hidden_abs:
+        m = _RE_SUBMIT_ABS.search(blob)
+        if m:
+            return m.group(0).strip()
 
     # 3. Any relative '/submit...' pattern
-    m = re.search(
-        r"(/submit[^\s\"'<>]*)",
-        blob,
-        flags=re.IGNORECASE,
-    )
-    if m:
-        return urljoin(quiz_url, m.group(1).strip())
+    if relative:
+        return urljoin(quiz_url, relative.strip())
 
     # 4. Fallback: any href link we collected that contains 'submit'
     for link in links:
@@ -225,11 +386,54 @@ def find_submit_url(
     return None
 
 
+def validate_submit_url(submit_url: str) -> None:
+    """
+    Cheap local check on the submit URL before any network work:
+      - must be http(s) with a host
+      - host must be in SUBMIT_ALLOWED_HOSTS, when that setting is non-empty
+    """
+    parsed = urlparse(submit_url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise RuntimeError(f"Invalid submit URL: {submit_url}")
+
+    allowed = settings.SUBMIT_ALLOWED_HOSTS
+    if allowed and parsed.hostname.lower() not in allowed:
+        raise RuntimeError(f"Submit host not allowed: {parsed.hostname}")
+
+
 # ---------------------------------------------------------
 # 3. Data file downloading / extraction
 # ---------------------------------------------------------
 
-async def download_and_extract_file_text(url: str) -> str:
+def _decode_head(data: bytes) -> str:
+    """Decode only as many bytes as can yield MAX_FILE_TEXT characters."""
+    # UTF-8 uses at most 4 bytes per character
+    return data[: MAX_FILE_TEXT * 4].decode("utf-8", errors="replace")[:MAX_FILE_TEXT]
+
+
+def _extract_pdf_text(data: bytes) -> str:
+    """Extract up to MAX_FILE_TEXT characters of text from a PDF with pypdf."""
+    from pypdf import PdfReader  # type: ignore
+
+    import io
+
+    reader = PdfReader(io.BytesIO(data))
+    chunks: List[str] = []
+    n_chars = 0
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        chunks.append(page_text)
+        n_chars += len(page_text)
+        # Only MAX_FILE_TEXT chars are kept; skip the remaining pages
+        if n_chars >= MAX_FILE_TEXT:
+            break
+    return "\n".join(chunks)[:MAX_FILE_TEXT]
+
+
+async def download_and_extract_file_text(
+    url: str,
+    client: Optional[httpx.AsyncClient] = None,
+) -> str:
     """
     Download a data file (CSV, JSON, TXT, PDF, etc) and return a text summary.
 
@@ -239,43 +443,52 @@ async def download_and_extract_file_text(url: str) -> str:
       - TXT: raw text
       - PDF: try to extract text with pypdf if available, else note it's a PDF
     """
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as http_client:
-        resp = await http_client.get(url)
+    client = client or get_client()
+    # Stream the body and stop once we have more than we could use
+    async with _host_sem(urlparse(url).netloc), client.stream("GET", url) as resp:
         resp.raise_for_status()
         content_type = resp.headers.get("content-type", "")
-        data = resp.content
+        if "pdf" in content_type.lower() or url.lower().endswith(".pdf"):
+            max_bytes = MAX_PDF_BYTES
+        else:
+            max_bytes = MAX_TEXT_BYTES
+        buf = bytearray()
+        async for chunk in resp.aiter_bytes(65536):
+            buf.extend(chunk)
+            if len(buf) >= max_bytes:
+                break
+    data = bytes(buf)
 
     text_summary = ""
 
     # Decide based on content type or file extension
     lowered = content_type.lower()
     if "text/csv" in lowered or url.lower().endswith(".csv"):
-        text_summary = data.decode("utf-8", errors="replace")
+        text_summary = _decode_head(data)
     elif "application/json" in lowered or url.lower().endswith(".json"):
         try:
-            obj = json.loads(data.decode("utf-8", errors="replace"))
-            text_summary = json.dumps(obj, indent=2)[:8000]
+            if _RE_LONG_DIGITS_B.search(data):
+                obj = json.loads(data.decode("utf-8", errors="replace"))
+                text_summary = json.dumps(obj, indent=2)[:MAX_FILE_TEXT]
+            else:
+                # orjson parses the bytes directly, no decode step needed
+                obj = orjson.loads(data)
+                text_summary = _decode_head(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
         except Exception:
-            text_summary = data.decode("utf-8", errors="replace")
+            text_summary = _decode_head(data)
     elif "text/plain" in lowered or url.lower().endswith(".txt"):
-        text_summary = data.decode("utf-8", errors="replace")
+        text_summary = _decode_head(data)
     elif "pdf" in lowered or url.lower().endswith(".pdf"):
         try:
-            from pypdf import PdfReader  # type: ignore
-
-            import io
-
-            reader = PdfReader(io.BytesIO(data))
-            chunks: List[str] = []
-            for page in reader.pages:
-                chunks.append(page.extract_text() or "")
-            text_summary = "\n".join(chunks)[:8000]
+            # pypdf parsing is CPU-bound; keep it off the event loop so
+            # concurrent downloads and LLM calls keep making progress
+            text_summary = await asyncio.to_thread(_extract_pdf_text, data)
         except Exception:
             text_summary = "[PDF file; could not extract text reliably]"
     else:
         # Fallback: try decode as text
         try:
-            text_summary = data.decode("utf-8", errors="replace")
+            text_summary = _decode_head(data)
         except Exception:
             text_summary = f"[Binary file of type {content_type}; length={len(data)}]"
 
@@ -291,32 +504,97 @@ def pick_data_file_links(
     Choose which links look like data files worth downloading.
     We'll pick ones that end with .csv, .json, .txt, .pdf, etc.
     """
-    exts = (".csv", ".json", ".txt", ".tsv", ".pdf")
     chosen: List[str] = []
     for link in links:
-        if any(link.lower().endswith(ext) for ext in exts):
+        # str.endswith takes the whole tuple in one C-level call
+        if link.lower().endswith(_DATA_FILE_EXTS):
             chosen.append(urljoin(quiz_url, link))
-    return sorted(set(chosen))
+    return list(dict.fromkeys(chosen))
+
+
+# ---------------------------------------------------------
+# 4. Submit with retries
+# ---------------------------------------------------------
+
+# Submitting is not idempotent: only retry when the server is known not to
+# have processed the answer (refused / rate-limited / no connection made).
+# Read timeouts are not retried, as the answer may already have landed.
+_RETRY_STATUSES = (429, 503)
+_RETRY_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Per-attempt submit timeout; with 4 attempts and <=20 s waits the worst
+# case stays around two minutes
+SUBMIT_TIMEOUT = 15.0
+_backoff = wait_random_exponential(min=1, max=20)
+
+
+def _is_transient_http_error(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRY_STATUSES
+    return isinstance(exc, _RETRY_TRANSPORT_ERRORS)
+
+
+def _wait_submit(retry_state: Any) -> float:
+    """Honour a numeric Retry-After header, else random exponential backoff."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), 20.0)
+    return _backoff(retry_state)
+
+
+def _dumps_payload(payload: Dict[str, Any]) -> bytes:
+    """Serialize a submit payload with orjson, falling back to json for big ints."""
+    try:
+        return orjson.dumps(payload)
+    except (orjson.JSONEncodeError, TypeError):
+        # orjson rejects integers outside the 64-bit range; json does not
+        return json.dumps(payload).encode("utf-8")
+
+
+@retry(
+    retry=retry_if_exception(_is_transient_http_error),
+    wait=_wait_submit,
+    stop=stop_after_attempt(4),
+    reraise=True,
+)
+async def _post_submit(
+    client: httpx.AsyncClient,
+    submit_url: str,
+    body: bytes,
+) -> httpx.Response:
+    resp = await client.post(
+        submit_url,
+        content=body,
+        headers={"Content-Type": "application/json"},
+        timeout=SUBMIT_TIMEOUT,
+    )
+    # We want to see error messages, so let 4xx raise
+    resp.raise_for_status()
+    return resp
 
 
 # ---------------------------------------------------------
-# 4. Solve a single quiz page
+# 5. Solve a single quiz page
 # ---------------------------------------------------------
 
 async def solve_single_quiz(
     quiz_url: str,
     student_email: str,
     student_secret: str,
+    client: Optional[httpx.AsyncClient] = None,
+    force: bool = False,
 ) -> Dict[str, Any]:
     """
     Solve a single quiz page:
       - Fetch quiz page
       - Extract instructions and data files
-      - Ask LLM for 'answer'
+      - Ask LLM for 'answer' (cached per quiz content unless force=True)
       - Submit answer to submit URL, follow next URL if provided
     """
+    client = client or get_client()
 
-    html, page_text, links = await fetch_quiz_page(quiz_url)
+    html, page_text, links = await fetch_quiz_page(quiz_url, client=client)
     instructions = extract_quiz_instructions(page_text)
     submit_url = find_submit_url(quiz_url, page_text, links, html)
 
@@ -329,26 +607,33 @@ async def solve_single_quiz(
         else:
             raise RuntimeError(f"Could not find submit URL on quiz page: {quiz_url}")
 
+    # Reject bad / disallowed submit URLs before spending an LLM call on them
+    validate_submit_url(submit_url)
+
     # Figure out which data files to download
     data_file_urls = pick_data_file_links(quiz_url, page_text, links)
     data_files: List[Dict[str, Any]] = []
 
-    for u in data_file_urls:
-        try:
-            text_summary = await download_and_extract_file_text(u)
+    # Download all files concurrently; failures come back as exceptions
+    downloads = await asyncio.gather(
+        *(download_and_extract_file_text(u, client=client) for u in data_file_urls),
+        return_exceptions=True,
+    )
+    for u, result in zip(data_file_urls, downloads):
+        if isinstance(result, Exception):
             data_files.append(
                 {
                     "url": u,
-                    "content_type": "unknown",
-                    "text_snippet": text_summary[:8000],
+                    "content_type": "error",
+                    "text_snippet": f"Error downloading file: {result}",
                 }
             )
-        except Exception as e:
+        else:
             data_files.append(
                 {
                     "url": u,
-                    "content_type": "error",
-                    "text_snippet": f"Error downloading file: {e}",
+                    "content_type": "unknown",
+                    "text_snippet": result[:MAX_FILE_TEXT],
                 }
             )
 
@@ -358,6 +643,7 @@ async def solve_single_quiz(
         page_text=page_text,
         quiz_instructions=instructions,
         data_files=data_files,
+        force=force,
     )
 
     # Build submit payload (prefer using template from page)
@@ -376,15 +662,17 @@ async def solve_single_quiz(
             "answer": answer,
         }
 
-    # Actually call the submit URL
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as http_client:
-        submit_resp = await http_client.post(submit_url, json=submit_payload)
-        # We want to see error messages, so let 4xx raise
-        submit_resp.raise_for_status()
-        try:
-            resp_json = submit_resp.json()
-        except Exception:
-            resp_json = {"raw": submit_resp.text}
+    # Actually call the submit URL; serialize once up front.
+    # 429 / 503 / connection failures are retried with backoff.
+    submit_resp = await _post_submit(client, submit_url, _dumps_payload(submit_payload))
+    try:
+        resp_json = orjson.loads(submit_resp.content)
+    except orjson.JSONDecodeError:
+        resp_json = {"raw": submit_resp.text}
+
+    # Don't let a re-run resubmit a cached answer the server rejected
+    if resp_json.get("correct") is False:
+        forget_answer(quiz_url, page_text, instructions, data_files)
 
     return {
         "quiz_url": quiz_url,
@@ -397,7 +685,7 @@ async def solve_single_quiz(
 
 
 # ---------------------------------------------------------
-# 5. Loop over quiz chain
+# 6. Loop over quiz chain
 # ---------------------------------------------------------
 
 async def run_quiz_chain(
@@ -405,10 +693,13 @@ async def run_quiz_chain(
     email: str,
     secret: str,
     max_steps: int = 5,
+    force: bool = False,
 ) -> Dict[str, Any]:
     """
     Repeatedly solve quizzes starting from quiz_url, following
     'next_url' in each submit response, up to max_steps.
+
+    force=True bypasses the cached LLM answers and re-asks the model.
     """
     results: List[Dict[str, Any]] = []
     current_url: Optional[str] = quiz_url
@@ -422,6 +713,7 @@ async def run_quiz_chain(
                 quiz_url=current_url,
                 student_email=email,
                 student_secret=secret,
+                force=force,
             )
         except Exception as e:
             results.append(
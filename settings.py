@@ -0,0 +1,56 @@
+# settings.py
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Snapshot of every environment variable the app reads.
+
+    Built once at import; other modules use the shared `settings` instance
+    instead of calling os.getenv() themselves.
+    """
+
+    STUDENT_EMAIL: Optional[str]
+    STUDENT_SECRET: Optional[str]
+    GEMINI_API_KEY: Optional[str]
+    GEMINI_MODEL: Optional[str]  # e.g. 'models/gemini-2.5-flash'
+    GEMINI_FALLBACK_MODEL: Optional[str]  # e.g. 'models/gemini-2.5-pro'
+    GEMINI_MAX_RPM: int
+    GEMINI_MAX_TPM: int
+    GEMINI_MAX_CONCURRENCY: int
+    MAX_CONCURRENT_QUIZZES: int
+    SUBMIT_ALLOWED_HOSTS: Tuple[str, ...]  # empty = any host
+
+
+def _positive_int(name: str, default: int) -> int:
+    """Read an integer env var that must be >= 1 (rates, semaphore sizes)."""
+    value = int(os.getenv(name, str(default)))
+    if value < 1:
+        raise ValueError(f"{name} must be at least 1, got {value}")
+    return value
+
+
+def load_settings() -> Settings:
+    return Settings(
+        STUDENT_EMAIL=os.getenv("STUDENT_EMAIL"),
+        STUDENT_SECRET=os.getenv("STUDENT_SECRET"),
+        GEMINI_API_KEY=os.getenv("GEMINI_API_KEY"),
+        GEMINI_MODEL=os.getenv("GEMINI_MODEL"),
+        GEMINI_FALLBACK_MODEL=os.getenv("GEMINI_FALLBACK_MODEL"),
+        GEMINI_MAX_RPM=_positive_int("GEMINI_MAX_RPM", 15),
+        GEMINI_MAX_TPM=_positive_int("GEMINI_MAX_TPM", 1000000),
+        GEMINI_MAX_CONCURRENCY=_positive_int("GEMINI_MAX_CONCURRENCY", 4),
+        MAX_CONCURRENT_QUIZZES=_positive_int("MAX_CONCURRENT_QUIZZES", 4),
+        SUBMIT_ALLOWED_HOSTS=tuple(
+            h.strip().lower()
+            for h in os.getenv("SUBMIT_ALLOWED_HOSTS", "").split(",")
+            if h.strip()
+        ),
+    )
+
+
+settings = load_settings()